@@ -0,0 +1,25 @@
+"""
+Gunicorn configuration for serving the Flask API in production.
+
+Run from the `backend` directory, next to `config.json`:
+
+    gunicorn index:app
+
+The gevent worker monkey-patches the standard library before the app is
+imported, so the blocking RPC calls and transaction receipt waits made with
+Web3.py yield to other requests instead of holding the worker.
+"""
+import json
+
+with open('config.json') as f:
+    config = json.load(f)
+
+bind = f"{config['server']['host']}:{config['server']['port']}"
+
+# A single worker process serves up to `worker_connections` requests
+# concurrently as greenlets. More than one worker is unsupported: each process
+# would run its own wallet nonce counter and send duplicate nonces, and the
+# in-memory caches and transaction statuses would not be shared.
+worker_class = 'gevent'
+workers = 1
+worker_connections = config['server'].get('worker_connections', 1000)
@@ -14,27 +14,50 @@ The API endpoints are as follows:
 - `/swap-pol`: POST endpoint for swapping POL tokens for another token.
 - `/auto-rebalance`: POST endpoint for performing an automated rebalance
   of tokens based on insights.
+- `/tx-status/<tx_hash>`: GET endpoint for the status of a transaction sent
+  by one of the POST endpoints, which respond before it is mined.
 
 The API requires a configuration file (`config.json`) with the following
 parameters:
 
 - `server`: object with `host` and `port` parameters for the Flask server.
 - `network`: object with `polygon_rpc_url` parameter for the Polygon RPC
-  endpoint.
+  endpoint, optional `receipt_timeout` and `receipt_poll_latency` parameters
+  (in seconds) for waiting on transaction receipts, and an optional
+  `rpc_cache_ttl` parameter (in seconds) for reusing read-only call results.
 - `wallet`: object with `address` and `private_key` parameters for the
   wallet to use.
-- `contracts`: object with `pol_address`, `dai_address`, and `router_address`
-  parameters for the POL, DAI, and UniswapV2Router contract addresses.
-- `uniswap`: object with `router_abi_path` parameter for the path to the
-  UniswapV2Router ABI file.
+- `contracts`: object with `pol_address`, `dai_address`, `router_address`,
+  and `price_feed_address` parameters for the POL, DAI, UniswapV2Router, and
+  price oracle contract addresses, and optional `pol_price_feed_address`,
+  `dai_price_feed_address`, and `multicall_address` parameters for per-token
+  price oracles and the Multicall3 contract address.
+- `uniswap`: object with `router_abi_path` and `price_feed_abi_path`
+  parameters for the paths to the UniswapV2Router and price oracle ABI files.
 - `logging`: object with `level` and `file` parameters for the logging level
-  and log file path.
+  and log file path, and an optional `metrics_file` parameter for the path of
+  the quantitative data file used by the insights.
+- `prices`: optional object with a `cache_ttl` parameter for how long, in
+  seconds, oracle prices are cached.
 """
-import json
+import heapq
 import logging
+import mmap
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import requests
+from eth_abi import decode_abi, encode_abi
+from eth_utils import function_signature_to_4byte_selector
+import lru
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from web3 import Web3
+from web3._utils.caching import generate_cache_key
+from web3.exceptions import TimeExhausted
 from web3.middleware import geth_poa_middleware
 
 # Set up logging
@@ -42,29 +65,510 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 # Set up config
-with open('config.json') as f:
-    config = json.load(f)
+with open('config.json', 'rb') as f:
+    config = orjson.loads(f.read())
 
 # Set up logging to a file
 log_file = config['logging']['file']
 logger.addHandler(logging.FileHandler(log_file))
 
+# Keep a separate metrics file open and line-buffered for quantitative data,
+# so each record costs a single write instead of an open and close per
+# request, and log messages never end up between the records
+metrics_file_path = config['logging'].get('metrics_file', 'metrics.csv')
+metrics_file = open(metrics_file_path, 'a', buffering=1)
+_metrics_lock = threading.Lock()
+
+def _write_metrics(*values):
+    """Append one comma-separated record of `values` to the metrics file."""
+    line = ','.join(str(value) for value in values) + '\n'
+    with _metrics_lock:
+        metrics_file.write(line)
+
+# Set up a pooled HTTP session so RPC calls reuse keep-alive connections.
+# Retries only cover failed connections and idempotent methods, so a
+# transaction is never broadcast twice.
+rpc_session = requests.Session()
+rpc_session.headers.update({'Connection': 'keep-alive'})
+rpc_adapter = HTTPAdapter(
+    pool_connections=64,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.1)
+)
+rpc_session.mount('https://', rpc_adapter)
+rpc_session.mount('http://', rpc_adapter)
+
 # Set up Web3 provider
 polygon_rpc_url = config['network']['polygon_rpc_url']
-w3 = Web3(Web3.HTTPProvider(polygon_rpc_url))
+w3 = Web3(Web3.HTTPProvider(
+    polygon_rpc_url,
+    request_kwargs={'timeout': 10},
+    session=rpc_session
+))
 w3.middleware_onion.inject(geth_poa_middleware, layer=0)
 
+# Set up RPC response caching. The chain id never changes and calls against
+# a pinned block always return the same result, so those are kept until
+# evicted; calls against the latest block are reused for a few seconds.
+rpc_cache_ttl = config['network'].get('rpc_cache_ttl', 5)
+_pinned_rpc_cache = lru.LRU(10000)
+_latest_rpc_cache = lru.LRU(10000)
+
+def _rpc_cache_middleware(make_request, web3):
+    """Web3 middleware serving repeated `eth_call` and `eth_chainId` from memory."""
+    def middleware(method, params):
+        if method == 'eth_chainId':
+            cache, ttl = _pinned_rpc_cache, None
+        elif method == 'eth_call':
+            block = params[1] if len(params) > 1 else 'latest'
+            if block in ('latest', 'pending'):
+                cache, ttl = _latest_rpc_cache, rpc_cache_ttl
+            else:
+                cache, ttl = _pinned_rpc_cache, None
+        else:
+            return make_request(method, params)
+
+        key = generate_cache_key((method, params))
+        now = time.monotonic()
+        cached = cache.get(key)
+        if cached and (ttl is None or now - cached[1] < ttl):
+            return cached[0]
+
+        response = make_request(method, params)
+        if 'error' not in response:
+            cache[key] = (response, now)
+        return response
+    return middleware
+
+w3.middleware_onion.add(_rpc_cache_middleware, 'rpc_cache')
+
 # Set up wallet
 private_key = config['wallet']['private_key']
 wallet_address = w3.eth.account.from_key(private_key).address
 
+# Set up unit constants. Token amounts have 18 decimals and oracle prices 8.
+WEI_PER_ETHER = 10**18
+PRICE_SCALE = 10**8
+
 # Set up token addresses
 pol_address = config['contracts']['pol_address']
+dai_address = config['contracts']['dai_address']
+
+# Set up the fixed parts of swap transactions, so handlers only fill in what
+# changes per request
+dai_pol_path = (dai_address, pol_address)
+tx_base = {'from': wallet_address}
+
+# Set up contracts, loading each ABI once instead of on every request
+with open(config['uniswap']['router_abi_path'], 'rb') as f:
+    router_abi = orjson.loads(f.read())
+router_contract = w3.eth.contract(
+    address=config['contracts']['router_address'],
+    abi=router_abi
+)
+
+with open(config['uniswap']['price_feed_abi_path'], 'rb') as f:
+    price_feed_abi = orjson.loads(f.read())
+
+# Each token can have its own price oracle, falling back to the default one
+price_feed_contracts = {
+    symbol: w3.eth.contract(
+        address=config['contracts'].get(
+            f'{symbol}_price_feed_address',
+            config['contracts']['price_feed_address']
+        ),
+        abi=price_feed_abi
+    )
+    for symbol in ('pol', 'dai')
+}
+
+# Set up Multicall3, deployed at the same address on Polygon and most other
+# chains, to read several balances with a single eth_call
+multicall_contract = w3.eth.contract(
+    address=config['contracts'].get(
+        'multicall_address',
+        '0xcA11bde05977b3631167028862bE2a173976CA11'
+    ),
+    abi=[{
+        'inputs': [{
+            'components': [
+                {'name': 'target', 'type': 'address'},
+                {'name': 'allowFailure', 'type': 'bool'},
+                {'name': 'callData', 'type': 'bytes'}
+            ],
+            'name': 'calls',
+            'type': 'tuple[]'
+        }],
+        'name': 'aggregate3',
+        'outputs': [{
+            'components': [
+                {'name': 'success', 'type': 'bool'},
+                {'name': 'returnData', 'type': 'bytes'}
+            ],
+            'name': 'returnData',
+            'type': 'tuple[]'
+        }],
+        'stateMutability': 'payable',
+        'type': 'function'
+    }]
+)
+get_eth_balance_selector = function_signature_to_4byte_selector(
+    'getEthBalance(address)'
+)
+
+# Set up receipt polling. Polygon produces a block roughly every two seconds,
+# so polling more often than that only adds RPC load while a worker waits.
+receipt_timeout = config['network'].get('receipt_timeout', 120)
+receipt_poll_latency = config['network'].get('receipt_poll_latency', 1)
+
+def _wait_for_receipt(tx_hash):
+    """
+    Wait for a transaction to be mined and return its receipt.
+
+    Polls the RPC endpoint every `receipt_poll_latency` seconds and gives up
+    after `receipt_timeout` seconds, so a stuck transaction cannot hold a
+    receipt worker indefinitely.
+    """
+    return w3.eth.wait_for_transaction_receipt(
+        tx_hash,
+        timeout=receipt_timeout,
+        poll_latency=receipt_poll_latency
+    )
+
+# Set up background receipt tracking. POST handlers respond as soon as a
+# transaction is broadcast, and its receipt is awaited here instead, with the
+# outcome kept for the `/tx-status` endpoint.
+transaction_statuses = lru.LRU(10000)
+_receipt_executor = ThreadPoolExecutor(max_workers=32)
+
+def _track_transaction(tx_hash, message, metrics=None):
+    """
+    Wait for a transaction's receipt in the background.
+
+    Once the transaction is mined successfully, `message` is logged and
+    `metrics`, if given, are written to the metrics file.
+
+    Returns:
+        The transaction hash as a hex string.
+    """
+    tx_hash = tx_hash.hex()
+    transaction_statuses[tx_hash] = {'status': 'pending'}
+    _receipt_executor.submit(_await_receipt, tx_hash, message, metrics)
+    return tx_hash
+
+def _await_receipt(tx_hash, message, metrics):
+    """Wait for the receipt of `tx_hash` and record the outcome."""
+    try:
+        receipt = _wait_for_receipt(tx_hash)
+    except Exception as e:
+        logger.error(f'Error waiting for transaction {tx_hash}: {e}')
+
+        # A transaction that never gets mined may be stuck behind a nonce gap
+        if isinstance(e, TimeExhausted):
+            _resync_nonce()
+
+        transaction_statuses[tx_hash] = {'status': 'error', 'error': str(e)}
+        return
+
+    if receipt.status != 1:
+        logger.error(f'Transaction {tx_hash} reverted')
+        transaction_statuses[tx_hash] = {
+            'status': 'failed',
+            'block_number': receipt.blockNumber
+        }
+        return
+
+    # Log the action
+    logger.info(message)
+
+    # Write quantitative data to metrics file
+    if metrics is not None:
+        _write_metrics(time.time(), *metrics)
+
+    transaction_statuses[tx_hash] = {
+        'status': 'confirmed',
+        'block_number': receipt.blockNumber
+    }
+
+def _batch_rpc(calls):
+    """
+    Send several JSON-RPC calls to the Polygon RPC endpoint in one request.
+
+    Args:
+        calls: list of `(method, params)` tuples.
+
+    Returns:
+        List with the raw `result` of each call, in the order given.
+    """
+    payload = [
+        {'jsonrpc': '2.0', 'id': i, 'method': method, 'params': params}
+        for i, (method, params) in enumerate(calls)
+    ]
+    response = rpc_session.post(polygon_rpc_url, json=payload, timeout=10)
+    response.raise_for_status()
+
+    # Some endpoints reject a whole batch with a single error object
+    items = response.json()
+    if not isinstance(items, list):
+        raise ValueError(items.get('error', items) if isinstance(items, dict) else items)
+
+    # Responses to a batch may come back in any order
+    results = {}
+    for item in items:
+        if 'error' in item:
+            raise ValueError(item['error'])
+        results[item.get('id')] = item.get('result')
+
+    missing = [
+        method for i, (method, _) in enumerate(calls) if i not in results
+    ]
+    if missing:
+        raise ValueError(f'No response to batched calls: {", ".join(missing)}')
+    return [results[i] for i in range(len(calls))]
+
+# Set up getAmountsOut calldata. The selector never changes and the encoded
+# path of the DAI -> POL swap is fixed, so only the amount is encoded per call.
+get_amounts_out_selector = function_signature_to_4byte_selector(
+    'getAmountsOut(uint256,address[])'
+)
+_encoded_paths = {
+    dai_pol_path: encode_abi(['uint256', 'address[]'], [0, dai_pol_path])[32:]
+}
+
+def _get_amounts_out_calldata(amount_in, path):
+    """Return the hex calldata for the router's `getAmountsOut(amount_in, path)`."""
+    encoded_path = _encoded_paths.get(path)
+    if encoded_path is None:
+        encoded_path = encode_abi(['uint256', 'address[]'], [0, path])[32:]
+    return Web3.toHex(
+        get_amounts_out_selector + amount_in.to_bytes(32, 'big') + encoded_path
+    )
+
+def _get_balances(*addresses):
+    """
+    Get the balances of several addresses with one Multicall3 `eth_call`.
+
+    Returns:
+        List with the balance of each address in wei, in the order given.
+    """
+    calls = [
+        (
+            multicall_contract.address,
+            False,
+            get_eth_balance_selector + encode_abi(['address'], [address])
+        )
+        for address in addresses
+    ]
+    results = multicall_contract.functions.aggregate3(calls).call()
+    return [decode_abi(['uint256'], return_data)[0] for _, return_data in results]
+
+# Set up nonce tracking. Every transaction from the wallet takes its nonce
+# from this counter, which is synced with the RPC endpoint on first use, after
+# the node rejects a nonce, and when a receipt wait times out. Nonces reserved
+# for transactions that failed to broadcast are handed out again first, so no
+# gap is left for later transactions to queue behind.
+_next_nonce = None
+_released_nonces = []
+_nonce_lock = threading.Lock()
+
+def _reserve_nonce():
+    """Return the next nonce for the wallet."""
+    global _next_nonce
+    with _nonce_lock:
+        if _next_nonce is None:
+            _next_nonce = w3.eth.get_transaction_count(wallet_address, 'pending')
+        if _released_nonces:
+            return heapq.heappop(_released_nonces)
+        nonce = _next_nonce
+        _next_nonce += 1
+        return nonce
+
+def _resync_nonce():
+    """Drop the local nonce counter so the next transaction resyncs it."""
+    global _next_nonce
+    with _nonce_lock:
+        _next_nonce = None
+        _released_nonces.clear()
+
+def _recover_nonce(nonce, error):
+    """
+    Recover the local nonce counter after `nonce` failed to broadcast.
+
+    If the node rejected the nonce, the counter has drifted and is resynced.
+    Otherwise `nonce` is released to be handed out again.
+    """
+    message = str(error).lower()
+    if 'nonce too low' in message or 'already known' in message:
+        _resync_nonce()
+        return
+
+    with _nonce_lock:
+        # A resync since the nonce was reserved already accounts for it
+        if _next_nonce is not None and nonce < _next_nonce:
+            heapq.heappush(_released_nonces, nonce)
+
+def _send_with_nonce(tx, sign=False):
+    """
+    Assign the next wallet nonce to a built transaction and broadcast it.
+
+    The nonce is reserved only once the transaction is built and its gas is
+    estimated, so requests failing before that never consume one.
+
+    Args:
+        tx: dict - The transaction, with everything but the nonce filled in
+        sign: bool - Whether to sign locally with the wallet's private key
+            instead of having the node sign it
+
+    Returns:
+        The transaction hash.
+    """
+    nonce = _reserve_nonce()
+    try:
+        tx = tx | {'nonce': nonce}
+        if sign:
+            signed_tx = w3.eth.account.sign_transaction(tx, private_key)
+            return w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        return w3.eth.send_transaction(tx)
+    except Exception as e:
+        _recover_nonce(nonce, e)
+        raise
+
+def _prepare_swap(amount_in, path):
+    """
+    Quote a swap and fetch the transaction parameters in one round-trip.
+
+    Batches the router's `getAmountsOut` call with the gas price lookup that
+    `buildTransaction` would otherwise make separately. The chain id comes
+    from the cached `eth_chainId` response, and `_send_with_nonce` adds the
+    nonce.
+
+    Returns:
+        Tuple with the amount of output tokens to receive and the transaction
+        parameters to pass to `buildTransaction`.
+    """
+    amounts_out, gas_price = _batch_rpc([
+        ('eth_call', [{
+            'to': router_contract.address,
+            'data': _get_amounts_out_calldata(amount_in, path)
+        }, 'latest']),
+        ('eth_gasPrice', [])
+    ])
+    amount_out = decode_abi(
+        ['uint256[]'],
+        Web3.toBytes(hexstr=amounts_out)
+    )[0][-1]
+
+    return amount_out, tx_base | {
+        'gasPrice': Web3.toInt(hexstr=gas_price),
+        'chainId': w3.eth.chain_id
+    }
+
+# Set up price cache. Oracle answers only change every few minutes, so recent
+# readings are served from memory instead of querying the oracle each time.
+price_cache_ttl = config.get('prices', {}).get('cache_ttl', 30)
+_price_cache = {}
+_price_cache_lock = threading.Lock()
+
+def _fetch_price(symbol):
+    """
+    Get the current price of a token in USD from its price oracle.
+
+    Prices are cached for `price_cache_ttl` seconds.
+
+    Args:
+        symbol: string - The token symbol, either `pol` or `dai`
+    """
+    now = time.monotonic()
+    with _price_cache_lock:
+        cached = _price_cache.get(symbol)
+    if cached and now - cached[1] < price_cache_ttl:
+        return cached[0]
+
+    price_feed = price_feed_contracts[symbol]
+    price = price_feed.functions.latestAnswer().call() / PRICE_SCALE
+    with _price_cache_lock:
+        _price_cache[symbol] = (price, now)
+    return price
+
+def _price_response(symbol):
+    """Build the JSON response for a price endpoint."""
+    try:
+        # Return success response with price
+        return jsonify({'price': _fetch_price(symbol)}), 200
+    except Exception as e:
+        # Log the error
+        logger.error(f'Error getting {symbol.upper()} price: {e}')
+
+        # Send failure response with error message
+        return jsonify({'error': str(e)}), 500
+
+# Set up the log tail cache. Parsed data points are reused until the log
+# file changes, which is detected by its modification time and size.
+_log_cache = {'key': None, 'data': []}
+_log_cache_lock = threading.RLock()
+
+def _read_log_tail(log_file_path, window_size):
+    """
+    Return the last `window_size` data points from the metrics file.
+
+    The file is memory-mapped and scanned backwards from its end, so only the
+    last lines are read however long it grows. Records that are not three
+    numbers, like those written by `/send`, are skipped. The parsed result is
+    cached until the file is modified.
+
+    Returns:
+        List of `(timestamp, amount_a, amount_b)` tuples, oldest first.
+    """
+    st = os.stat(log_file_path)
+    key = (st.st_mtime_ns, st.st_size, window_size)
+    with _log_cache_lock:
+        if _log_cache['key'] == key:
+            return _log_cache['data']
+
+        data = []
+        if st.st_size:
+            with open(log_file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = len(mm)
+                while len(data) < window_size and end > 0:
+                    start = mm.rfind(b'\n', 0, end) + 1
+                    fields = mm[start:end].split(b',')
+                    end = start - 1
+                    if len(fields) != 3:
+                        continue
+                    try:
+                        data.append(tuple(float(field) for field in fields))
+                    except ValueError:
+                        continue
+        data.reverse()
+
+        _log_cache['key'] = key
+        _log_cache['data'] = data
+        return data
 
 # Set up Flask app
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the round-trip through str that `dumps` needs
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj),
+            mimetype='application/json'
+        )
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 @app.route('/send', methods=['POST'])
 def send_transaction():
@@ -77,11 +581,12 @@ def send_transaction():
     - `amount_in_pol`: number - The amount of POL to send in POL
 
     It will send the transaction to the recipient, and log the action to the
-    log file.
+    log file once the transaction is mined.
 
     Returns:
-        JSON response with the following data:
+        JSON response with status 202 and the following data:
         - `transaction_hash`: string - The transaction hash
+        - `status`: string - `pending`, see `/tx-status/<tx_hash>`
     """
     data = request.get_json()
     recipient_address = data.get('recipient_address')
@@ -92,24 +597,23 @@ def send_transaction():
 
     try:
         # Prepare transaction details
-        tx = {
+        tx = tx_base | {
             'to': recipient_address,
-            'value': w3.utils.to_wei(str(amount_in_pol), 'ether')
+            'value': int(Decimal(str(amount_in_pol)) * WEI_PER_ETHER),
+            'gasPrice': w3.eth.gas_price
         }
+        tx['gas'] = w3.eth.estimate_gas(tx)
+
+        # Send the transaction and track it until it is mined
+        tx_hash = _send_with_nonce(tx)
+        tx_hash = _track_transaction(
+            tx_hash,
+            f'Sent {amount_in_pol} POL to {recipient_address}',
+            (amount_in_pol,)
+        )
 
-        # Send the transaction
-        tx_hash = w3.eth.send_transaction(tx)
-        w3.eth.wait_for_transaction_receipt(tx_hash)
-
-        # Log the action
-        logger.info(f'Sent {amount_in_pol} POL to {recipient_address}')
-
-        # Write quantitative data to log file
-        with open(config['logging']['file'], 'a') as f:
-            f.write(f'{time.time()},{amount_in_pol},{recipient_address}\n')
-
-        # Send success response with transaction hash
-        return jsonify({'transaction_hash': tx_hash.hex()}), 200
+        # Send accepted response with transaction hash
+        return jsonify({'transaction_hash': tx_hash, 'status': 'pending'}), 202
     except Exception as e:
         # Log the error
         logger.error(f'Error sending transaction: {e}')
@@ -128,96 +632,37 @@ def buy_pol():
 
     try:
         # Get current POL price in USD
-        pol_price = get_pol_price()
+        pol_price = _fetch_price('pol')
         amount_in_pol = amount_in_usd / pol_price
 
-        # Get DAI token address
-        dai_address = config['contracts']['dai_address']
-
-        # Get AMM router contract
-        with open(config['uniswap']['router_abi_path']) as f:
-            router_abi = json.load(f)
-        router_contract = w3.eth.contract(
-            address=config['contracts']['router_address'],
-            abi=router_abi
-        )
-
-        # Prepare path for swap
-        path = [dai_address, pol_address]
-
-        # Get amount of POL tokens to receive
-        amount_out = router_contract.functions.getAmountsOut(
-            w3.toWei(str(amount_in_usd), 'ether'),
-            path
-        ).call()[-1]
+        # Get amount of POL tokens to receive and transaction parameters
+        amount_in = int(Decimal(str(amount_in_usd)) * WEI_PER_ETHER)
+        amount_out, tx_params = _prepare_swap(amount_in, dai_pol_path)
 
         # Prepare transaction details
         tx = router_contract.functions.swapExactTokens(
-            w3.toWei(str(amount_in_usd), 'ether'),
+            amount_in,
             amount_out,
-            path,
+            dai_pol_path,
             wallet_address,
             int(time.time()) + 100
-        ).buildTransaction({
-            'from': wallet_address,
-            'nonce': w3.eth.get_transaction_count(wallet_address)
-        })
+        ).buildTransaction(tx_params)
 
         # Sign and send the transaction
-        signed_tx = w3.eth.account.sign_transaction(tx, private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-        w3.eth.wait_for_transaction_receipt(tx_hash)
-
-        # Log the action
-        logger.info(f'Bought {amount_in_pol} POL with {amount_in_usd} USD')
-
-        # Write quantitative data to log file
-        with open(log_file, 'a') as f:
-            f.write(f'{time.time()},{amount_in_pol},{amount_in_usd}\n')
-
-        # Send success response with transaction hash
-        return jsonify({'transaction_hash': tx_hash.hex()}), 200
-    except Exception as e:
-        # Log the error
-        logger.error(f'Error buying POL: {e}')
-
-        # Send failure response with error message
-        return jsonify({'error': str(e)}), 500
+        tx_hash = _send_with_nonce(tx, sign=True)
 
-@app.route('/get-pol-price', methods=['GET'])
-def get_pol_price():
-    """
-    Get the current POL price in USD using a price oracle.
-
-    Returns:
-        JSON response with the following data:
-        - `price`: float - The current price of POL in USD
-    """
-    try:
-        # Get current POL price from oracle
-        price_feed = w3.eth.contract(
-            address=config['contracts']['price_feed_address'],
-            abi=[{
-                'constant': True,
-                'inputs': [],
-                'name': 'latestAnswer',
-                'outputs': [{'name': '', 'type': 'int256'}],
-                'payable': False,
-                'stateMutability': 'view',
-                'type': 'function'
-            }]
+        # Track the transaction until it is mined
+        tx_hash = _track_transaction(
+            tx_hash,
+            f'Bought {amount_in_pol} POL with {amount_in_usd} USD',
+            (amount_in_pol, amount_in_usd)
         )
-        price = price_feed.functions.latestAnswer().call() / 10**8
 
-        # Write quantitative data to log file
-        with open(log_file, 'a') as f:
-            f.write(f'{time.time()},{price}\n')
-
-        # Return success response with price
-        return jsonify({'price': price}), 200
+        # Send accepted response with transaction hash
+        return jsonify({'transaction_hash': tx_hash, 'status': 'pending'}), 202
     except Exception as e:
         # Log the error
-        logger.error(f'Error getting POL price: {e}')
+        logger.error(f'Error buying POL: {e}')
 
         # Send failure response with error message
         return jsonify({'error': str(e)}), 500
@@ -232,7 +677,8 @@ def rebalance():
     and performs a liquidity add operation using UniswapV2Router.
 
     Returns:
-        JSON response with transaction hash on success, or an error message on failure.
+        JSON response with status 202 and the pending transaction hash on
+        success, or an error message on failure.
     """
     data = request.get_json()
     token_a = data.get('token_a')
@@ -245,21 +691,14 @@ def rebalance():
 
     try:
         # Get current balances of the tokens
-        token_a_balance = w3.eth.get_balance(token_a)
-        token_b_balance = w3.eth.get_balance(token_b)
+        token_a_balance, token_b_balance = _get_balances(token_a, token_b)
 
         # Calculate the amount of tokenA to sell and tokenB to buy
-        amount_a_to_sell = int(amount_a * token_a_balance / 10**18)
-        amount_b_to_buy = int(amount_b * token_b_balance / 10**18)
-
-        # Load Uniswap router contract
-        router = w3.eth.contract(
-            address=config['contracts']['router_address'],
-            abi=json.load(open(config['uniswap']['router_abi_path']))
-        )
+        amount_a_to_sell = int(amount_a * token_a_balance // WEI_PER_ETHER)
+        amount_b_to_buy = int(amount_b * token_b_balance // WEI_PER_ETHER)
 
         # Add liquidity to the pool
-        tx = router.functions.addLiquidity(
+        tx = router_contract.functions.addLiquidity(
             token_a,
             token_b,
             amount_a_to_sell,
@@ -268,20 +707,18 @@ def rebalance():
             1,
             wallet_address,
             int(time.time()) + 60
-        ).transact({'from': wallet_address})
-
-        # Wait for transaction receipt
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx)
-
-        # Log the action
-        logger.info(f'Rebalanced tokens: {amount_a_to_sell} of {token_a}, {amount_b_to_buy} of {token_b}')
-
-        # Write quantitative data to log file
-        with open(log_file, 'a') as f:
-            f.write(f'{time.time()},{amount_a_to_sell},{amount_b_to_buy}\n')
+        ).buildTransaction(tx_base)
+        tx_hash = _send_with_nonce(tx)
+
+        # Track the transaction until it is mined
+        tx_hash = _track_transaction(
+            tx_hash,
+            f'Rebalanced tokens: {amount_a_to_sell} of {token_a}, {amount_b_to_buy} of {token_b}',
+            (amount_a_to_sell, amount_b_to_buy)
+        )
 
-        # Return success response with transaction hash
-        return jsonify({'transaction_hash': tx_receipt.transactionHash.hex()}), 200
+        # Return accepted response with transaction hash
+        return jsonify({'transaction_hash': tx_hash, 'status': 'pending'}), 202
     except Exception as e:
         # Log the error
         logger.error(f'Error rebalancing tokens: {e}')
@@ -289,41 +726,28 @@ def rebalance():
         # Send failure response with error message
         return jsonify({'error': str(e)}), 500
 
-@app.route('/rebalance-insights', methods=['GET'])
-def get_rebalance_insights():
+def _compute_insights():
     """
-    Get insights on when to rebalance tokens using machine learning.
+    Compute the buy, sell, and rebalance insights from the metrics file.
 
     Returns:
-        JSON response with the following data:
-        - `buy`: boolean - Whether it is a good time to buy tokens
-        - `sell`: boolean - Whether it is a good time to sell tokens
-        - `rebalance`: boolean - Whether it is a good time to rebalance tokens
-
-    Description:
-        This endpoint uses a simple moving average model to predict when to rebalance tokens.
-        The model takes into account the last 10 data points from the log file and calculates the
-        average of the token amounts. If the current token amount is greater than 10% above the
-        average, it is a good time to buy tokens. If the current token amount is less than 10%
-        below the average, it is a good time to sell or rebalance tokens.
+        Dict with `buy`, `sell`, and `rebalance` booleans.
     """
-    # Load data from log file
-    data = []
-    log_file_path = config['logging']['file']
-    with open(log_file_path, 'r') as f:
-        for line in f:
-            timestamp, amount_a, amount_b = line.strip().split(',')
-            data.append((int(timestamp), float(amount_a), float(amount_b)))
+    window_size = 10
+
+    # Load the last data points from metrics file
+    data = _read_log_tail(metrics_file_path, window_size)
 
     # Train a machine learning model to predict when to rebalance tokens
     # For now, use a simple moving average model
-    window_size = 10
     buy = False
     sell = False
     rebalance = False
     if len(data) >= window_size:
-        avg_a = sum(x[1] for x in data[-window_size:]) / window_size
-        avg_b = sum(x[2] for x in data[-window_size:]) / window_size
+        # The data holds only the window, so average whole columns
+        _, amounts_a, amounts_b = zip(*data)
+        avg_a = sum(amounts_a) / window_size
+        avg_b = sum(amounts_b) / window_size
         if data[-1][1] > avg_a * 1.1:
             buy = True
         elif data[-1][2] > avg_b * 1.1:
@@ -331,12 +755,39 @@ def get_rebalance_insights():
         elif data[-1][1] < avg_a * 0.9 or data[-1][2] < avg_b * 0.9:
             rebalance = True
 
-    # Return insights
-    return jsonify({
+    return {
         'buy': buy,
         'sell': sell,
         'rebalance': rebalance
-    }), 200
+    }
+
+@app.route('/rebalance-insights', methods=['GET'])
+def get_rebalance_insights():
+    """
+    Get insights on when to rebalance tokens using machine learning.
+
+    Returns:
+        JSON response with the following data:
+        - `buy`: boolean - Whether it is a good time to buy tokens
+        - `sell`: boolean - Whether it is a good time to sell tokens
+        - `rebalance`: boolean - Whether it is a good time to rebalance tokens
+
+    Description:
+        This endpoint uses a simple moving average model to predict when to rebalance tokens.
+        The model takes into account the last 10 data points from the metrics file and calculates the
+        average of the token amounts. If the current token amount is greater than 10% above the
+        average, it is a good time to buy tokens. If the current token amount is less than 10%
+        below the average, it is a good time to sell or rebalance tokens.
+    """
+    try:
+        # Return insights
+        return jsonify(_compute_insights()), 200
+    except Exception as e:
+        # Log the error
+        logger.error(f'Error getting rebalance insights: {e}')
+
+        # Send failure response with error message
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/auto-rebalance', methods=['POST'])
 def auto_rebalance():
@@ -344,13 +795,21 @@ def auto_rebalance():
     Perform an automated rebalance of tokens based on the insights.
 
     Returns:
-        JSON response with the following data:
+        JSON response with status 202 and the following data when a
+        rebalance is performed, or the insights otherwise:
         - `transaction_hash`: string - The transaction hash of the rebalance
+        - `status`: string - `pending`, see `/tx-status/<tx_hash>`
     """
-    # Get insights on whether to rebalance
-    insights_response = get_rebalance_insights()
-    insights = insights_response.json()
-    
+    try:
+        # Get insights on whether to rebalance
+        insights = _compute_insights()
+    except Exception as e:
+        # Log the error
+        logger.error(f'Error getting rebalance insights: {e}')
+
+        # Send failure response with error message
+        return jsonify({'error': str(e)}), 500
+
     # Check if rebalancing is recommended
     if insights.get('rebalance'):
         # Extract token and amount details from request
@@ -366,46 +825,35 @@ def auto_rebalance():
 
         try:
             # Get the current balances of the tokens
-            token_a_balance = w3.eth.get_balance(token_a)
-            token_b_balance = w3.eth.get_balance(token_b)
+            token_a_balance, token_b_balance = _get_balances(token_a, token_b)
 
             # Calculate the amount of tokenA to sell and tokenB to buy
-            amount_a_to_sell = int(amount_a * token_a_balance / 10**18)
-            amount_b_to_buy = int(amount_b * token_b_balance / 10**18)
-
-            # Load Uniswap router contract
-            router_abi = json.load(open(config['uniswap']['router_abi_path']))
-            router_address = config['contracts']['router_address']
-            router_contract = w3.eth.contract(address=router_address, abi=router_abi)
+            amount_a_to_sell = int(amount_a * token_a_balance // WEI_PER_ETHER)
+            amount_b_to_buy = int(amount_b * token_b_balance // WEI_PER_ETHER)
 
             # Prepare path for swap and calculate output tokens
-            path = [token_a, token_b]
-            amount_out = router_contract.functions.getAmountsOut(
-                w3.utils.to_wei(str(amount_a_to_sell), 'ether'),
-                path
-            ).call()[-1]
+            path = (token_a, token_b)
+            amount_in = amount_a_to_sell * WEI_PER_ETHER
+            amount_out, tx_params = _prepare_swap(amount_in, path)
 
             # Build transaction
             tx = router_contract.functions.swapExactTokens(
-                w3.utils.to_wei(str(amount_a_to_sell), 'ether'),
+                amount_in,
                 amount_out,
                 path,
                 wallet_address,
                 int(time.time()) + 100
-            ).buildTransaction({
-                'from': wallet_address,
-                'nonce': w3.eth.get_transaction_count(wallet_address)
-            })
+            ).buildTransaction(tx_params)
 
-            # Send the transaction and wait for receipt
-            tx_hash = w3.eth.send_transaction(tx)
-            w3.eth.wait_for_transaction_receipt(tx_hash)
+            # Send the transaction and track it until it is mined
+            tx_hash = _send_with_nonce(tx)
+            tx_hash = _track_transaction(
+                tx_hash,
+                f'Auto-rebalanced {amount_a_to_sell} {token_a} for {amount_b_to_buy} {token_b}'
+            )
 
-            # Log the successful rebalance action
-            logger.info(f'Auto-rebalanced {amount_a_to_sell} {token_a} for {amount_b_to_buy} {token_b}')
-
-            # Return success response with transaction hash
-            return jsonify({'transaction_hash': tx_hash.hex()}), 200
+            # Return accepted response with transaction hash
+            return jsonify({'transaction_hash': tx_hash, 'status': 'pending'}), 202
         except Exception as e:
             # Log the error
             logger.error(f'Error auto-rebalancing: {e}')
@@ -413,6 +861,25 @@ def auto_rebalance():
             # Send failure response with error message
             return jsonify({'error': str(e)}), 500
 
+    # Rebalancing is not recommended, so return the insights unchanged
+    return jsonify(insights), 200
+
+@app.route('/tx-status/<tx_hash>', methods=['GET'])
+def get_tx_status(tx_hash):
+    """
+    Get the status of a transaction sent by one of the POST endpoints.
+
+    Returns:
+        JSON response with the following data:
+        - `status`: string - One of `pending`, `confirmed`, `failed`, `error`,
+          or `unknown` for transactions this server is not tracking
+        - `block_number`: number - The block the transaction was mined in,
+          once it is `confirmed` or `failed`
+        - `error`: string - Why waiting for the receipt failed, on `error`
+    """
+    status = transaction_statuses.get(tx_hash.lower(), {'status': 'unknown'})
+    return jsonify(status), 200
+
 @app.route('/log', methods=['GET'])
 def get_log():
     """
@@ -445,21 +912,7 @@ def get_pol_price():
         JSON response with the following data:
         - `price`: float - The current price of POL in USD
     """
-    try:
-        # Get current POL price from oracle
-        price_feed_abi = json.load(open(config['uniswap']['price_feed_abi_path']))
-        price_feed_address = config['contracts']['price_feed_address']
-        price_feed_contract = w3.eth.contract(address=price_feed_address, abi=price_feed_abi)
-        price = price_feed_contract.functions.latestAnswer().call() / 10**8
-
-        # Return success response with price
-        return jsonify({'price': price}), 200
-    except Exception as e:
-        # Log the error
-        logger.error(f'Error getting POL price: {e}')
-
-        # Send failure response with error message
-        return jsonify({'error': str(e)}), 500
+    return _price_response('pol')
 
 @app.route('/get-dai-price', methods=['GET'])
 def get_dai_price():
@@ -470,21 +923,7 @@ def get_dai_price():
         JSON response with the following data:
         - `price`: float - The current price of DAI in USD
     """
-    try:
-        # Get current DAI price from oracle
-        price_feed_abi = json.load(open(config['uniswap']['price_feed_abi_path']))
-        price_feed_address = config['contracts']['price_feed_address']
-        price_feed_contract = w3.eth.contract(address=price_feed_address, abi=price_feed_abi)
-        price = price_feed_contract.functions.latestAnswer().call() / 10**8
-
-        # Return success response with price
-        return jsonify({'price': price}), 200
-    except Exception as e:
-        # Log the error
-        logger.error(f'Error getting DAI price: {e}')
-
-        # Send failure response with error message
-        return jsonify({'error': str(e)}), 500
+    return _price_response('dai')
 
 # TODO: connect wallet
 # TODO: learn user preferences
\ No newline at end of file